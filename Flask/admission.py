@@ -0,0 +1,149 @@
+"""
+Admission control for the analysis endpoints.
+
+Each client (configured API key, or IP address) gets a token bucket,
+and each analysis path (image model, manual area) has its own concurrency
+limit. Interactive web requests may queue briefly for a slot and use the
+whole limit; bulk API requests only get a share of it and are never queued.
+Rejections carry a Retry-After hint so callers can answer 429 straight away.
+"""
+import math
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+INTERACTIVE = 'interactive'
+BULK = 'bulk'
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request must be turned away with 429"""
+
+    def __init__(self, reason, retry_after):
+        super().__init__(f"Request rejected ({reason}), retry after {retry_after}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second, up to `capacity`"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def take(self):
+        """Take one token; return 0 on success or the seconds until one is available"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+    def refund(self):
+        """Give back a token taken for a request that was not served"""
+        self.tokens = min(self.capacity, self.tokens + 1)
+
+    def is_full(self):
+        elapsed = time.monotonic() - self.updated
+        return self.tokens + elapsed * self.rate >= self.capacity
+
+
+class AdmissionController:
+    """Per-client rate limits plus per-path concurrency limits with priorities"""
+
+    MAX_BUCKETS = 10000
+
+    def __init__(self, rate=0.5, burst=5, limits=None, bulk_share=0.5, queue_timeout=5.0):
+        self.rate = rate
+        self.burst = burst
+        self.limits = limits or {'image': 2, 'manual': 8}
+        self.bulk_limits = {path: max(1, int(limit * bulk_share)) for path, limit in self.limits.items()}
+        self.queue_timeout = queue_timeout
+        self._buckets = OrderedDict()  # least recently used first
+        self._lock = threading.Lock()
+        self._slots = threading.Condition(self._lock)
+        self._active = {path: 0 for path in self.limits}
+        self._stats = {
+            'admitted': {path: 0 for path in self.limits},
+            'rejected_rate_limited': 0,
+            'rejected_concurrency': 0,
+            'queued': 0,
+            'queue_wait_seconds': 0.0,
+        }
+
+    @contextmanager
+    def admit(self, client, path, priority=INTERACTIVE):
+        """Hold a slot on `path` for the duration of the with-block or raise AdmissionRejected"""
+        self._check_rate(client)
+        try:
+            self._acquire(path, priority)
+        except AdmissionRejected:
+            # Turned away for capacity, not quota: don't charge the client
+            with self._lock:
+                bucket = self._buckets.get(client)
+                if bucket is not None:
+                    bucket.refund()
+            raise
+        try:
+            yield
+        finally:
+            with self._slots:
+                self._active[path] -= 1
+                self._slots.notify_all()
+
+    def stats(self):
+        """Return a snapshot of admission counters"""
+        with self._lock:
+            stats = {key: dict(value) if isinstance(value, dict) else value
+                     for key, value in self._stats.items()}
+            stats['active'] = dict(self._active)
+            stats['limits'] = dict(self.limits)
+            stats['tracked_clients'] = len(self._buckets)
+        return stats
+
+    def _check_rate(self, client):
+        with self._lock:
+            bucket = self._buckets.get(client)
+            if bucket is None:
+                if len(self._buckets) >= self.MAX_BUCKETS:
+                    self._prune_buckets()
+                bucket = self._buckets[client] = TokenBucket(self.rate, self.burst)
+            else:
+                self._buckets.move_to_end(client)
+            wait = bucket.take()
+            if wait:
+                self._stats['rejected_rate_limited'] += 1
+                raise AdmissionRejected('rate limited', math.ceil(wait))
+
+    def _prune_buckets(self):
+        # Full buckets carry no state worth keeping
+        for client in [c for c, b in self._buckets.items() if b.is_full()]:
+            del self._buckets[client]
+        # Still at the bound: forget the least recently seen clients
+        while len(self._buckets) >= self.MAX_BUCKETS:
+            self._buckets.popitem(last=False)
+
+    def _acquire(self, path, priority):
+        limit = self.limits[path] if priority == INTERACTIVE else self.bulk_limits[path]
+        with self._slots:
+            if self._active[path] >= limit:
+                if priority != INTERACTIVE:
+                    self._stats['rejected_concurrency'] += 1
+                    raise AdmissionRejected('busy', 1)
+
+                self._stats['queued'] += 1
+                start = time.monotonic()
+                admitted = self._slots.wait_for(lambda: self._active[path] < limit, self.queue_timeout)
+                self._stats['queue_wait_seconds'] += time.monotonic() - start
+                if not admitted:
+                    self._stats['rejected_concurrency'] += 1
+                    raise AdmissionRejected('busy', math.ceil(self.queue_timeout))
+
+            self._active[path] += 1
+            self._stats['admitted'][path] += 1
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+IPC Benchmark
+Compares per-image round-trip overhead of the shared-memory transport
+against pickling arrays over a multiprocessing pipe
+"""
+import time
+from multiprocessing import Pipe, Process
+
+import numpy as np
+
+from shm_transport import InferenceClient, SlotRing, serve
+
+SIZES = [256, 1024, 2048]
+ROUNDS = 50
+
+
+def make_mask(image):
+    """Stand-in for the model: cheap so IPC cost dominates"""
+    return (image[:, :, 0] > 127).astype(np.uint8)
+
+
+def pickle_server(conn):
+    while True:
+        image = conn.recv()
+        if image is None:
+            break
+        conn.send(make_mask(image))
+
+
+def bench_pickle(image):
+    parent, child = Pipe()
+    proc = Process(target=pickle_server, args=(child,))
+    proc.start()
+    try:
+        parent.send(image)
+        parent.recv()  # warm-up
+        start = time.perf_counter()
+        for _ in range(ROUNDS):
+            parent.send(image)
+            parent.recv()
+        return (time.perf_counter() - start) / ROUNDS
+    finally:
+        parent.send(None)
+        proc.join()
+
+
+def bench_shm(image):
+    inputs = SlotRing(slots=2, slot_bytes=image.nbytes)
+    outputs = SlotRing(slots=2, slot_bytes=image.shape[0] * image.shape[1])
+    parent, child = Pipe()
+    proc = Process(target=serve, args=(child, inputs, outputs, make_mask))
+    proc.start()
+    child.close()
+    client = InferenceClient(parent, inputs, outputs)
+    try:
+        with client.infer(image):
+            pass  # warm-up
+        start = time.perf_counter()
+        for _ in range(ROUNDS):
+            with client.infer(image) as mask:
+                mask.sum()
+        return (time.perf_counter() - start) / ROUNDS
+    finally:
+        client.close()
+        proc.join()
+        for ring in (inputs, outputs):
+            ring.close()
+            ring.unlink()
+
+
+def main():
+    print("🧪 IPC round-trip per image (image in, mask out)")
+    print("-" * 50)
+    rng = np.random.default_rng(0)
+    for size in SIZES:
+        image = rng.integers(0, 256, (size, size, 3), dtype=np.uint8)
+        baseline = bench_pickle(image)
+        shm = bench_shm(image)
+        print(f"{size}x{size}: pickle {baseline * 1000:.2f} ms | "
+              f"shared memory {shm * 1000:.2f} ms | {baseline / shm:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
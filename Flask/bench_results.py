@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Results Page Benchmark
+Compares server CPU and response bytes per result view for the
+server-rendered results page and the static (client-side) results page
+"""
+import json
+import time
+
+import numpy as np
+from flask import render_template
+from PIL import Image
+
+from main import (app, create_analysis_plot, create_bill_comparison_chart,
+                  result_store)
+from results_data import build_result_payload, encode_analysis_image
+
+ROUNDS = 20
+
+METRICS = {
+    "recommended_panels": 25,
+    "recommended_panels_explanation": "40 m² of usable roof fits about 25 panels of 1.6 m² each.",
+    "total_capacity_kw": 8.75,
+    "total_capacity_kw_explanation": "25 panels at 350 W each.",
+    "yearly_production_kwh": 12775.0,
+    "yearly_production_explanation": "8.75 kW at about 4 peak sun hours per day.",
+    "installation_cost_inr": 437500.0,
+    "installation_cost_explanation": "About ₹50,000 per installed kW.",
+    "yearly_savings_inr": 83037.5,
+    "yearly_savings_explanation": "12,775 kWh at ₹6.5 per kWh.",
+    "payback_period_years": 5.3,
+    "payback_period_explanation": "Installation cost divided by yearly savings.",
+}
+
+
+def sample_analysis():
+    """Synthetic 512px image and 256px mask standing in for a model run"""
+    rng = np.random.default_rng(0)
+    image = Image.fromarray(rng.integers(0, 256, (512, 512, 3), dtype=np.uint8))
+    mask = np.zeros((256, 256), dtype=np.int64)
+    mask[60:200, 40:220] = 1
+    mask[120:140, 100:160] = 0
+    return image, mask
+
+
+def measure(view):
+    """Average CPU seconds and response bytes over ROUNDS calls"""
+    view()  # warm-up
+    start = time.process_time()
+    size = 0
+    for _ in range(ROUNDS):
+        size = view()
+    return (time.process_time() - start) / ROUNDS, size
+
+
+def main():
+    image, mask = sample_analysis()
+    area = float(np.sum(mask == 1) * 0.01)
+    ai_response = json.dumps(METRICS)
+    client = app.test_client()
+
+    def server_view():
+        with app.test_request_context():
+            html = render_template('results.html',
+                                   area=area,
+                                   plot_data=create_analysis_plot(image, mask),
+                                   metrics=METRICS,
+                                   ai_response=ai_response,
+                                   bill_chart_data=create_bill_comparison_chart(METRICS),
+                                   method='image')
+        return len(html.encode())
+
+    start = time.process_time()
+    payload = build_result_payload(area, METRICS, ai_response, 'image', encode_analysis_image(image, mask))
+    result_id = result_store.save(payload)
+    store_cpu = time.process_time() - start
+
+    shell = client.get('/results')
+    etag = shell.headers['ETag']
+
+    def static_view():
+        # The shell is cached by the browser; only the result payload is fetched
+        return len(client.get(f'/api/results/{result_id}').data)
+
+    def shell_revalidation():
+        return len(client.get('/results', headers={'If-None-Match': etag}).data)
+
+    server_cpu, server_bytes = measure(server_view)
+    static_cpu, static_bytes = measure(static_view)
+    revalidate_cpu, _ = measure(shell_revalidation)
+
+    print("🧪 Results view: server-rendered vs static page")
+    print("-" * 50)
+    print(f"Server-rendered: {server_cpu * 1000:.1f} ms CPU, {server_bytes / 1024:.1f} KB per view")
+    print(f"Static page:     {static_cpu * 1000:.1f} ms CPU, {static_bytes / 1024:.1f} KB per view")
+    print(f"                 + {len(shell.data) / 1024:.1f} KB shell once "
+          f"({revalidate_cpu * 1000:.1f} ms CPU per 304 revalidation)")
+    print(f"                 + {store_cpu * 1000:.1f} ms CPU once to encode and store the result")
+    print(f"CPU per view: {server_cpu / static_cpu:.0f}x less | bytes per view: {server_bytes / static_bytes:.0f}x less")
+
+
+if __name__ == '__main__':
+    main()
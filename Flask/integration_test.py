@@ -45,7 +45,7 @@ def test_flask_app():
     
     # Test 4: Check directories
     print("4. 📁 Directory structure test...")
-    required_dirs = ['templates', 'static', 'static/uploads', 'static/results']
+    required_dirs = ['templates', 'static', 'static/uploads']
     for dir_name in required_dirs:
         if os.path.exists(dir_name):
             print(f"   ✅ {dir_name}/ exists")
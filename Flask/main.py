@@ -1,4 +1,4 @@
-from flask import Flask, request, render_template, jsonify, flash, redirect, url_for
+from flask import Flask, request, render_template, jsonify, flash, redirect, url_for, make_response, send_from_directory
 import torch
 import torchvision.transforms as T
 import numpy as np
@@ -12,7 +12,16 @@ from openai import OpenAI
 import os
 import re
 import json
+import hashlib
+import tempfile
+from contextlib import contextmanager
 from model_loader import load_model_with_fallback
+from single_flight import SingleFlight
+from admission import AdmissionController, AdmissionRejected, INTERACTIVE, BULK
+from functools import wraps
+from results_data import (ResultStore, build_result_payload, encode_analysis_image,
+                          encode_mask_rle, decode_mask_rle,
+                          MONTHLY_CONSUMPTION_KWH, ELECTRICITY_RATE_INR)
 from werkzeug.utils import secure_filename
 import secrets
 from dotenv import load_dotenv
@@ -25,13 +34,17 @@ app.secret_key = secrets.token_hex(16)  # For flash messages
 
 # Configure upload settings
 UPLOAD_FOLDER = 'static/uploads'
+# Outside static/ so results are only served by /api/results with private caching
+RESULTS_FOLDER = os.path.join(app.instance_path, 'results')
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg'}
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+# 'server' renders charts with matplotlib; 'static' returns JSON drawn client-side
+app.config['RESULTS_MODE'] = os.getenv('RESULTS_MODE', 'server')
 
 # Create upload directory if it doesn't exist
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-os.makedirs('static/results', exist_ok=True)
+result_store = ResultStore(RESULTS_FOLDER)
 
 # Load model and initialize transform (gracefully handle missing model for development)
 print("Loading model...")
@@ -51,6 +64,54 @@ transform = T.Compose([
     T.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225])
 ])
 
+# Coalesce identical in-flight analyses (retries, duplicate uploads)
+PROMPT_VERSION = 1
+single_flight = SingleFlight(os.getenv("SINGLE_FLIGHT_DIR") or os.path.join(app.instance_path, 'single_flight'))
+
+# Admission control: per-client rate limits and per-path concurrency limits
+admission_control = AdmissionController(
+    rate=float(os.getenv("ADMISSION_RATE", "0.5")),  # requests/second per client
+    burst=int(os.getenv("ADMISSION_BURST", "5")),
+    limits={
+        'image': int(os.getenv("IMAGE_CONCURRENCY", "2")),
+        'manual': int(os.getenv("MANUAL_CONCURRENCY", "8")),
+    },
+)
+
+# Comma-separated API keys that get their own quota; anything else is rate limited by IP
+API_KEYS = {key.strip() for key in os.getenv("API_KEYS", "").split(",") if key.strip()}
+
+def admission_client_id():
+    """Quota key for the current request: a configured API key, otherwise the client IP"""
+    api_key = request.headers.get('X-API-Key')
+    if api_key and api_key in API_KEYS:
+        return f"key:{api_key}"
+    return f"ip:{request.remote_addr}"
+
+def api_request_path():
+    """Pick the analysis path of an API request without parsing (and spooling) its body"""
+    # Known approximation: a multipart POST carrying only `area` (a manual entry)
+    # is counted against the stricter image limit, since telling the two apart
+    # would mean reading the body
+    return 'image' if request.mimetype == 'multipart/form-data' else 'manual'
+
+def admission_required(path, priority):
+    """Reject over-quota requests with 429 before the upload is read or saved"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            try:
+                with admission_control.admit(admission_client_id(), path() if callable(path) else path, priority):
+                    return view(*args, **kwargs)
+            except AdmissionRejected as e:
+                headers = {'Retry-After': str(e.retry_after)}
+                if priority == BULK:
+                    return jsonify({'error': f'Too many requests ({e.reason})'}), 429, headers
+                flash(f'The server is busy. Please try again in {e.retry_after} seconds.')
+                return render_template('index.html'), 429, headers
+        return wrapper
+    return decorator
+
 # Initialize OpenAI client
 def get_openai_client():
     api_key = os.getenv("OPENROUTER_API_KEY")
@@ -124,6 +185,11 @@ def parse_json_from_text(text):
     except Exception as e:
         raise ValueError(f"Failed to parse JSON from AI response: {e}")
 
+def get_ai_analysis(area_m2):
+    """Ask the AI for an analysis, sharing the call with identical in-flight requests"""
+    key = f"area:{area_m2:.2f}:prompt-v{PROMPT_VERSION}"
+    return single_flight.do(key, lambda: ask_openrouter(get_prompt(area_m2)))
+
 def create_bill_comparison_chart(metrics):
     """Create a chart comparing electricity bills with and without solar"""
     try:
@@ -132,10 +198,10 @@ def create_bill_comparison_chart(metrics):
         monthly_savings = metrics['yearly_savings_inr'] / 12
         
         # Assuming average electricity rate in India (₹5-8 per kWh)
-        avg_electricity_rate = 6.5  # ₹ per kWh
+        avg_electricity_rate = ELECTRICITY_RATE_INR  # ₹ per kWh
         
         # Calculate monthly consumption based on average Indian household (1,395 kWh/month)
-        avg_monthly_consumption = 1395  # kWh
+        avg_monthly_consumption = MONTHLY_CONSUMPTION_KWH  # kWh
         monthly_bill_without_solar = avg_monthly_consumption * avg_electricity_rate
         
         # Calculate bill with solar (reduced consumption from grid)
@@ -193,58 +259,127 @@ def create_bill_comparison_chart(metrics):
     except Exception as e:
         raise ValueError(f"Error creating bill comparison chart: {str(e)}")
 
-def process_image(image_path):
+def run_model(image):
+    """Run the segmentation model on a PIL image and return (predicted_mask, estimated_area)"""
+    input_tensor = transform(image).unsqueeze(0).to(device)
+
+    with torch.no_grad():
+        output = model(input_tensor)
+        predicted_mask = torch.argmax(output, dim=1).squeeze().cpu().numpy()
+
+    # Calculate rooftop area
+    rooftop_pixels = np.sum(predicted_mask == 1)
+    area_per_pixel_m2 = 0.01
+    estimated_area = rooftop_pixels * area_per_pixel_m2
+
+    return predicted_mask, estimated_area
+
+def predict_rooftop(image_path, digest=None):
+    """
+    Run the model on an image file and return (image, predicted_mask, estimated_area).
+
+    Given the upload's digest, identical in-flight uploads share one model run.
+    Only the area and the run-length-encoded mask are shared; each request
+    renders its own plot.
+    """
+    # Load and process image
+    image = Image.open(image_path).convert("RGB")
+    if digest is None:
+        predicted_mask, estimated_area = run_model(image)
+        return image, predicted_mask, estimated_area
+
+    def shared_run():
+        predicted_mask, estimated_area = run_model(image)
+        return float(estimated_area), encode_mask_rle(predicted_mask)
+
+    estimated_area, rle = single_flight.do(f"mask:{digest}", shared_run)
+    return image, decode_mask_rle(rle), estimated_area
+
+def create_analysis_plot(image, predicted_mask):
+    """Render the original image and predicted mask side by side as a base64 PNG"""
+    # Create visualization
+    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(12, 5))
+
+    # Original image
+    ax1.imshow(image)
+    ax1.set_title("Original Image")
+    ax1.axis("off")
+
+    # Predicted mask
+    ax2.imshow(predicted_mask, cmap="viridis")
+    ax2.set_title("Predicted Rooftop Mask")
+    ax2.axis("off")
+
+    plt.tight_layout()
+
+    # Save plot to base64 string
+    img_buffer = io.BytesIO()
+    plt.savefig(img_buffer, format='png', dpi=150, bbox_inches='tight')
+    img_buffer.seek(0)
+    plot_data = base64.b64encode(img_buffer.getvalue()).decode()
+    plt.close()
+
+    return plot_data
+
+def process_image(image_path, digest=None):
     """Process uploaded image and return rooftop analysis"""
     if not MODEL_AVAILABLE:
         # Return mock data for development mode
         return 150.0, "data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNkYPhfDwAChwGA60e6kgAAAABJRU5ErkJggg=="
     
     try:
-        # Load and process image
-        image = Image.open(image_path).convert("RGB")
-        input_tensor = transform(image).unsqueeze(0).to(device)
+        image, predicted_mask, estimated_area = predict_rooftop(image_path, digest)
+        return estimated_area, create_analysis_plot(image, predicted_mask)
+        
+    except Exception as e:
+        raise ValueError(f"Error processing image: {str(e)}")
 
-        with torch.no_grad():
-            output = model(input_tensor)
-            predicted_mask = torch.argmax(output, dim=1).squeeze().cpu().numpy()
+def process_image_data(image_path, digest=None):
+    """Process uploaded image and return rooftop analysis as compact data for client-side rendering"""
+    if not MODEL_AVAILABLE:
+        # No mask in development mode
+        return 150.0, None
 
-        # Calculate rooftop area
-        rooftop_pixels = np.sum(predicted_mask == 1)
-        area_per_pixel_m2 = 0.01
-        estimated_area = rooftop_pixels * area_per_pixel_m2
+    try:
+        image, predicted_mask, estimated_area = predict_rooftop(image_path, digest)
+        return estimated_area, encode_analysis_image(image, predicted_mask)
 
-        # Create visualization
-        fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(12, 5))
-        
-        # Original image
-        ax1.imshow(image)
-        ax1.set_title("Original Image")
-        ax1.axis("off")
-        
-        # Predicted mask
-        ax2.imshow(predicted_mask, cmap="viridis")
-        ax2.set_title("Predicted Rooftop Mask")
-        ax2.axis("off")
-        
-        plt.tight_layout()
-        
-        # Save plot to base64 string
-        img_buffer = io.BytesIO()
-        plt.savefig(img_buffer, format='png', dpi=150, bbox_inches='tight')
-        img_buffer.seek(0)
-        plot_data = base64.b64encode(img_buffer.getvalue()).decode()
-        plt.close()
-        
-        return estimated_area, plot_data
-        
     except Exception as e:
         raise ValueError(f"Error processing image: {str(e)}")
 
+@contextmanager
+def saved_upload(file):
+    """Save an upload to a file of its own and yield (path, sha256 of its bytes); removed afterwards"""
+    digest = hashlib.sha256(file.stream.read()).hexdigest()
+    file.stream.seek(0)
+    # A unique name per request: identical concurrent uploads must not share (or delete) one file
+    suffix = '.' + secure_filename(file.filename).rsplit('.', 1)[-1].lower()
+    fd, file_path = tempfile.mkstemp(suffix=suffix, dir=app.config['UPLOAD_FOLDER'])
+    os.close(fd)
+    try:
+        file.save(file_path)
+        yield file_path, digest
+    finally:
+        os.remove(file_path)
+
+def analyze_image(image_path, digest, static=False):
+    """Run process_image (or process_image_data), sharing the model run with identical in-flight uploads"""
+    if static:
+        return process_image_data(image_path, digest)
+    return process_image(image_path, digest)
+
+def static_results_redirect(area, metrics, ai_response, method, analysis_image=None):
+    """Store the result payload and send the browser to the cached results page"""
+    payload = build_result_payload(area, metrics, ai_response, method, analysis_image)
+    result_id = result_store.save(payload)
+    return redirect(url_for('results_page') + '#' + result_id)
+
 @app.route('/')
 def index():
     return render_template('index.html')
 
 @app.route('/analyze', methods=['POST'])
+@admission_required('image', INTERACTIVE)
 def analyze():
     try:
         # Check if this is image upload method
@@ -266,13 +401,10 @@ def analyze():
                 flash('Invalid file type. Please upload JPG, JPEG, or PNG files only.')
                 return redirect(url_for('index'))
             
-            # Save uploaded file
-            filename = secure_filename(file.filename)
-            file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            file.save(file_path)
-            
-            # Process image
-            estimated_area, plot_data = process_image(file_path)
+            # Save and process uploaded file (plot_data is compact mask data in static results mode)
+            static_results = app.config['RESULTS_MODE'] == 'static'
+            with saved_upload(file) as (file_path, digest):
+                estimated_area, plot_data = analyze_image(file_path, digest, static=static_results)
             
             # Check minimum area
             if estimated_area < 10:
@@ -280,16 +412,15 @@ def analyze():
                 return redirect(url_for('index'))
             
             # Get AI analysis
-            prompt = get_prompt(estimated_area)
-            ai_response = ask_openrouter(prompt)
+            ai_response = get_ai_analysis(estimated_area)
             metrics = parse_json_from_text(ai_response)
             
+            if static_results:
+                return static_results_redirect(estimated_area, metrics, ai_response, 'image', plot_data)
+            
             # Generate bill comparison chart
             bill_chart_data = create_bill_comparison_chart(metrics)
             
-            # Clean up uploaded file
-            os.remove(file_path)
-            
             return render_template('results.html', 
                                  area=estimated_area,
                                  plot_data=plot_data,
@@ -306,6 +437,7 @@ def analyze():
         return redirect(url_for('index'))
 
 @app.route('/analyze-manual', methods=['POST'])
+@admission_required('manual', INTERACTIVE)
 def analyze_manual():
     try:
         # Get manually entered area
@@ -330,10 +462,12 @@ def analyze_manual():
             return redirect(url_for('index'))
         
         # Get AI analysis
-        prompt = get_prompt(estimated_area)
-        ai_response = ask_openrouter(prompt)
+        ai_response = get_ai_analysis(estimated_area)
         metrics = parse_json_from_text(ai_response)
         
+        if app.config['RESULTS_MODE'] == 'static':
+            return static_results_redirect(estimated_area, metrics, ai_response, 'manual')
+        
         # Generate bill comparison chart
         bill_chart_data = create_bill_comparison_chart(metrics)
         
@@ -353,6 +487,7 @@ def analyze_manual():
         return redirect(url_for('index'))
 
 @app.route('/api/analyze', methods=['POST'])
+@admission_required(api_request_path, BULK)
 def api_analyze():
     """API endpoint for programmatic access"""
     try:
@@ -386,22 +521,14 @@ def api_analyze():
                 return jsonify({'error': 'Invalid file type'}), 400
             
             # Save and process file
-            filename = secure_filename(file.filename)
-            file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            file.save(file_path)
-            
-            estimated_area, _ = process_image(file_path)
+            with saved_upload(file) as (file_path, digest):
+                estimated_area, _ = analyze_image(file_path, digest)
             
             if estimated_area < 10:
-                os.remove(file_path)
                 return jsonify({'error': 'Rooftop area too small'}), 400
-            
-            # Clean up file
-            os.remove(file_path)
         
         # Get AI analysis
-        prompt = get_prompt(estimated_area)
-        ai_response = ask_openrouter(prompt)
+        ai_response = get_ai_analysis(estimated_area)
         metrics = parse_json_from_text(ai_response)
         
         # Generate bill comparison chart
@@ -417,6 +544,36 @@ def api_analyze():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/results')
+def results_page():
+    """Static results shell; the result id is in the URL fragment and fetched client-side"""
+    response = make_response(render_template('results_static.html', static_shell=True))
+    response.cache_control.public = True
+    response.cache_control.max_age = 24 * 60 * 60
+    response.add_etag()
+    return response.make_conditional(request)
+
+@app.route('/api/results/<result_id>')
+def api_result(result_id):
+    """Compact JSON payload of a stored result"""
+    if not result_store.exists(result_id):
+        return jsonify({'error': 'Result not found'}), 404
+    response = send_from_directory(RESULTS_FOLDER, result_store.filename(result_id),
+                                   mimetype='application/json', max_age=24 * 60 * 60)
+    # Results never change, but they belong to one user
+    response.cache_control.public = False
+    response.cache_control.private = True
+    response.cache_control.immutable = True
+    return response
+
+@app.route('/metrics')
+def runtime_metrics():
+    """Runtime counters for monitoring"""
+    return jsonify({
+        'single_flight': single_flight.stats(),
+        'admission': admission_control.stats(),
+    })
+
 @app.errorhandler(413)
 def too_large(e):
     flash('File is too large. Maximum size is 16MB.')
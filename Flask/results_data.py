@@ -0,0 +1,117 @@
+"""
+Compact result payloads for the static results page.
+
+Instead of server-rendered PNGs, a result is stored as a small JSON
+document (area, metrics, run-length-encoded mask and a thumbnail) that
+templates/results_static.html draws in the browser.
+"""
+import base64
+import io
+import json
+import os
+import re
+import secrets
+import time
+
+import numpy as np
+
+PAYLOAD_VERSION = 1
+
+# Bill assumptions shared with the server-rendered bill comparison chart
+MONTHLY_CONSUMPTION_KWH = 1395
+ELECTRICITY_RATE_INR = 6.5
+
+RESULT_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{16,64}$')
+
+
+def encode_mask_rle(mask):
+    """
+    Run-length encode the rooftop class of a mask, row-major.
+
+    Counts alternate between background and rooftop runs, starting with
+    background (so the first count may be 0).
+    """
+    flat = (np.asarray(mask) == 1).astype(np.uint8).ravel()
+    if flat.size == 0:
+        return {'shape': list(np.shape(mask)), 'counts': []}
+    changes = np.flatnonzero(np.diff(flat)) + 1
+    counts = np.diff(np.concatenate(([0], changes, [flat.size])))
+    if flat[0]:
+        counts = np.concatenate(([0], counts))
+    return {'shape': list(np.shape(mask)), 'counts': counts.tolist()}
+
+
+def decode_mask_rle(rle):
+    """Inverse of encode_mask_rle; returns a uint8 mask of 0s and 1s"""
+    values = np.arange(len(rle['counts'])) % 2
+    flat = np.repeat(values.astype(np.uint8), rle['counts'])
+    return flat.reshape(rle['shape'])
+
+
+def encode_analysis_image(image, predicted_mask, quality=80):
+    """Encoded mask plus a JPEG thumbnail of the input at mask resolution"""
+    height, width = np.shape(predicted_mask)
+    thumbnail = image.resize((width, height))
+    buffer = io.BytesIO()
+    thumbnail.save(buffer, format='JPEG', quality=quality)
+    return {
+        'mask': encode_mask_rle(predicted_mask),
+        'image': 'data:image/jpeg;base64,' + base64.b64encode(buffer.getvalue()).decode(),
+    }
+
+
+def build_result_payload(area, metrics, ai_response, method, analysis_image=None):
+    """Everything the static results page needs to render one result"""
+    return {
+        'version': PAYLOAD_VERSION,
+        'method': method,
+        'area': float(area),
+        'metrics': metrics,
+        'ai_response': ai_response,
+        'assumptions': {
+            'monthly_consumption_kwh': MONTHLY_CONSUMPTION_KWH,
+            'electricity_rate_inr': ELECTRICITY_RATE_INR,
+        },
+        'analysis_image': analysis_image,
+    }
+
+
+class ResultStore:
+    """Result payloads stored as JSON files, shared by all worker processes"""
+
+    def __init__(self, folder, ttl_seconds=24 * 60 * 60):
+        self.folder = folder
+        self.ttl_seconds = ttl_seconds
+        os.makedirs(folder, mode=0o700, exist_ok=True)
+
+    def filename(self, result_id):
+        return f"{result_id}.json"
+
+    def save(self, payload):
+        """Store a payload and return its unguessable id"""
+        self.prune()
+        result_id = secrets.token_urlsafe(16)
+        path = os.path.join(self.folder, self.filename(result_id))
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(payload, f, separators=(',', ':'))
+        os.replace(tmp_path, path)
+        return result_id
+
+    def exists(self, result_id):
+        if not RESULT_ID_PATTERN.match(result_id):
+            return False
+        return os.path.exists(os.path.join(self.folder, self.filename(result_id)))
+
+    def prune(self):
+        """Delete results older than the TTL"""
+        cutoff = time.time() - self.ttl_seconds
+        for name in os.listdir(self.folder):
+            if not name.endswith('.json'):
+                continue
+            path = os.path.join(self.folder, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                pass
@@ -0,0 +1,268 @@
+"""
+Shared-memory transport between web workers and a dedicated inference process.
+
+Images and masks live in fixed-size slots of a shared-memory ring; only a
+small SlotDescriptor travels over the control pipe. Both sides get zero-copy
+numpy views onto the slots.
+
+Slot lifecycle:
+    acquire() -> write()/view() -> send descriptor -> view() -> release()
+The side that finishes reading a slot releases it.
+"""
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+from multiprocessing import Queue, shared_memory
+from queue import Empty
+
+import numpy as np
+
+SlotDescriptor = namedtuple('SlotDescriptor', ['slot', 'shape', 'dtype'])
+
+
+class SlotRing:
+    """
+    A ring of equally sized shared-memory slots.
+
+    The process that creates the ring owns it and must call unlink() when
+    done. Pass the ring to child processes as a Process argument; they
+    attach to the same memory and free-slot queue.
+    """
+
+    def __init__(self, slots=4, slot_bytes=2048 * 2048 * 3):
+        self.slots = slots
+        self.slot_bytes = slot_bytes
+        self._shm = shared_memory.SharedMemory(create=True, size=slots * slot_bytes)
+        self._free = Queue()
+        for slot in range(slots):
+            self._free.put(slot)
+        self._owner = True
+
+    @property
+    def name(self):
+        return self._shm.name
+
+    def __getstate__(self):
+        return {
+            'name': self._shm.name,
+            'slots': self.slots,
+            'slot_bytes': self.slot_bytes,
+            'free': self._free,
+        }
+
+    def __setstate__(self, state):
+        self.slots = state['slots']
+        self.slot_bytes = state['slot_bytes']
+        self._shm = _attach(state['name'])
+        self._free = state['free']
+        self._owner = False
+
+    def acquire(self, timeout=None):
+        """Reserve a free slot, blocking until one is released"""
+        try:
+            return self._free.get(timeout=timeout)
+        except Empty:
+            raise TimeoutError(f"No free shared-memory slot after {timeout}s")
+
+    def release(self, slot):
+        """Return a slot to the ring once its contents are no longer needed"""
+        self._free.put(slot)
+
+    def view(self, descriptor):
+        """Zero-copy numpy view of the array stored in a slot"""
+        dtype = np.dtype(descriptor.dtype)
+        nbytes = int(np.prod(descriptor.shape)) * dtype.itemsize
+        if nbytes > self.slot_bytes:
+            raise ValueError(f"Array of {nbytes} bytes does not fit in a {self.slot_bytes}-byte slot")
+        offset = descriptor.slot * self.slot_bytes
+        return np.ndarray(descriptor.shape, dtype=dtype, buffer=self._shm.buf, offset=offset)
+
+    def write(self, slot, array):
+        """Copy array into a slot and return its descriptor"""
+        array = np.asarray(array)
+        descriptor = SlotDescriptor(slot, array.shape, array.dtype.str)
+        self.view(descriptor)[...] = array
+        return descriptor
+
+    def close(self):
+        """Detach from the shared memory; all views must be dropped first"""
+        self._shm.close()
+
+    def unlink(self):
+        """Free the shared memory (owner only)"""
+        if self._owner:
+            self._shm.unlink()
+
+
+def _attach(name):
+    try:
+        # The owner unlinks; don't let this process's resource tracker do it too
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:  # Python < 3.13
+        return shared_memory.SharedMemory(name=name)
+
+
+def serve(conn, inputs, outputs, handler, max_batch=1):
+    """
+    Inference-process loop: read input slots, run handler, write the results.
+
+    Messages are (request_id, SlotDescriptor) and replies are
+    (request_id, SlotDescriptor, error). Sending None stops the loop.
+
+    With max_batch > 1, requests already waiting on the pipe are gathered
+    into one batch and handler receives (and returns) a list of arrays.
+    The server releases every input slot it receives.
+    """
+    while True:
+        message = conn.recv()
+        if message is None:
+            break
+        batch = [message]
+        stop = False
+        while len(batch) < max_batch and conn.poll(0):
+            message = conn.recv()
+            if message is None:
+                stop = True
+                break
+            batch.append(message)
+
+        try:
+            views = [inputs.view(in_desc) for _, in_desc in batch]
+            results = handler(views) if max_batch > 1 else [handler(views[0])]
+            if len(results) != len(batch):
+                raise ValueError(f"Handler returned {len(results)} results for {len(batch)} inputs")
+        except Exception as e:
+            results = [e] * len(batch)
+
+        try:
+            for (request_id, _), result in zip(batch, results):
+                _send_result(conn, outputs, request_id, result)
+        finally:
+            # Results may be views of the inputs, so only release once they are copied out
+            views = results = None
+            for _, in_desc in batch:
+                inputs.release(in_desc.slot)
+        if stop:
+            break
+
+
+def _send_result(conn, outputs, request_id, result):
+    if isinstance(result, Exception):
+        conn.send((request_id, None, str(result)))
+        return
+    out_slot = outputs.acquire()
+    try:
+        out_desc = outputs.write(out_slot, result)
+    except Exception as e:
+        outputs.release(out_slot)
+        conn.send((request_id, None, str(e)))
+        return
+    conn.send((request_id, out_desc, None))
+
+
+class InferenceClient:
+    """
+    Web-worker side of the transport.
+
+    Any number of threads may call infer() at once; a reader thread matches
+    replies to callers by request id. Once a request is sent, the server
+    owns its input slot. Replies that arrive after their caller timed out
+    have their output slot released by the reader.
+    """
+
+    def __init__(self, conn, inputs, outputs):
+        self.conn = conn
+        self.inputs = inputs
+        self.outputs = outputs
+        self._lock = threading.Lock()
+        self._next_id = 0
+        self._pending = {}
+        self._closed = False
+        self._reader = threading.Thread(target=self._read_replies, daemon=True)
+        self._reader.start()
+
+    @contextmanager
+    def infer(self, array, timeout=None):
+        """
+        Send array for inference and yield a zero-copy view of the result.
+
+        timeout covers both waiting for an input slot and waiting for the
+        reply. The output slot is released when the with-block exits, so
+        copy the view if the result must outlive it.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        slot = self.inputs.acquire(timeout=timeout)
+        try:
+            in_desc = self.inputs.write(slot, array)
+        except Exception:
+            self.inputs.release(slot)
+            raise
+
+        reply = _Reply()
+        with self._lock:
+            if self._closed:
+                self.inputs.release(slot)
+                raise ValueError("Inference process is not running")
+            self._next_id += 1
+            request_id = self._next_id
+            self._pending[request_id] = reply
+            try:
+                self.conn.send((request_id, in_desc))
+            except Exception:
+                del self._pending[request_id]
+                self.inputs.release(slot)
+                raise
+
+        remaining = None if deadline is None else max(0, deadline - time.monotonic())
+        if not reply.done.wait(remaining):
+            with self._lock:
+                if self._pending.pop(request_id, None) is not None:
+                    raise TimeoutError(f"No inference reply after {timeout}s")
+            # The reader already claimed the reply; it is about to be set
+            reply.done.wait()
+
+        out_desc, error = reply.value
+        if error is not None:
+            raise ValueError(f"Inference failed: {error}")
+        try:
+            yield self.outputs.view(out_desc)
+        finally:
+            self.outputs.release(out_desc.slot)
+
+    def close(self):
+        """Stop the inference loop; the reader exits when the server's end closes"""
+        with self._lock:
+            if not self._closed:
+                self._closed = True
+                self.conn.send(None)
+
+    def _read_replies(self):
+        while True:
+            try:
+                request_id, out_desc, error = self.conn.recv()
+            except (EOFError, OSError):
+                break
+            with self._lock:
+                reply = self._pending.pop(request_id, None)
+            if reply is None:
+                # Caller gave up waiting
+                if out_desc is not None:
+                    self.outputs.release(out_desc.slot)
+                continue
+            reply.value = (out_desc, error)
+            reply.done.set()
+
+        # Inference process is gone: fail everything still waiting
+        with self._lock:
+            self._closed = True
+            pending, self._pending = self._pending, {}
+        for reply in pending.values():
+            reply.value = (None, "inference process exited")
+            reply.done.set()
+
+
+class _Reply:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
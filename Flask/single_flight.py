@@ -0,0 +1,181 @@
+"""
+Request coalescing (single-flight) for duplicate in-flight analyses.
+
+Concurrent calls with the same key share one computation: threads in the
+same process wait on the leader's result, and other worker processes wait
+on a per-key file lock and read the result the leader left behind.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to per-process coalescing only
+    fcntl = None
+
+
+def _default_lock_dir():
+    # Per-user, so another account cannot pre-create it in the shared temp dir
+    user = os.getuid() if hasattr(os, "getuid") else os.getenv("USERNAME", "user")
+    return os.path.join(tempfile.gettempdir(), f"solar-rooftop-singleflight-{user}")
+
+
+class _Call:
+    """A computation in flight inside this process"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls that share a key.
+
+    Results shared across processes must be JSON serializable. Only calls
+    that overlap are coalesced; nothing is cached once the leader finishes.
+    Result files only need to outlive the followers already waiting on the
+    lock, so they are pruned after `result_ttl` seconds. Results larger than
+    `max_shared_bytes` are not written at all; waiting processes recompute.
+    """
+
+    def __init__(self, lock_dir=None, result_ttl=30, lock_ttl=600, max_shared_bytes=256 * 1024):
+        self.lock_dir = lock_dir or _default_lock_dir()
+        # Results can contain analyses of users' images, and followers trust
+        # result files: the directory must be private to this user
+        os.makedirs(self.lock_dir, mode=0o700, exist_ok=True)
+        if hasattr(os, "getuid") and os.stat(self.lock_dir).st_uid != os.getuid():
+            raise PermissionError(f"Single-flight directory {self.lock_dir} is owned by another user")
+        os.chmod(self.lock_dir, 0o700)
+        self.result_ttl = result_ttl
+        self.lock_ttl = lock_ttl
+        self.max_shared_bytes = max_shared_bytes
+        self._last_prune = 0
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._stats = {
+            "executed": 0,
+            "deduplicated_threads": 0,
+            "deduplicated_processes": 0,
+            "in_flight": 0,
+        }
+
+    def do(self, key, fn):
+        """Run fn() once for all concurrent callers with the same key"""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self._stats["deduplicated_threads"] += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                self._stats["in_flight"] += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = self._do_across_processes(key, fn)
+        except Exception as e:
+            call.error = e
+        finally:
+            with self._lock:
+                del self._calls[key]
+                self._stats["in_flight"] -= 1
+            call.done.set()
+
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def stats(self):
+        """Return a snapshot of the coalescing counters"""
+        with self._lock:
+            stats = dict(self._stats)
+        stats["deduplicated"] = stats["deduplicated_threads"] + stats["deduplicated_processes"]
+        return stats
+
+    def _execute(self, fn):
+        with self._lock:
+            self._stats["executed"] += 1
+        return fn()
+
+    def _do_across_processes(self, key, fn):
+        if fcntl is None:
+            return self._execute(fn)
+
+        self.prune()
+        digest = hashlib.sha256(key.encode()).hexdigest()
+        lock_path = os.path.join(self.lock_dir, f"{digest}.lock")
+        result_path = os.path.join(self.lock_dir, f"{digest}.json")
+
+        with open(lock_path, "a") as lock_file:
+            # Taken before trying the lock so a leader finishing in between still counts
+            waited_since = time.time()
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                # Another process is computing this key; wait for it to finish
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                result = self._read_result(result_path, waited_since)
+                if result is not None:
+                    with self._lock:
+                        self._stats["deduplicated_processes"] += 1
+                    return result["value"]
+
+            # Mark the lock as in use so prune() leaves it alone
+            os.utime(lock_path)
+            try:
+                value = self._execute(fn)
+                self._write_result(result_path, value, self.max_shared_bytes)
+                return value
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def prune(self, force=False):
+        """Delete result files older than result_ttl and idle lock files older than lock_ttl"""
+        now = time.time()
+        if not force and now - self._last_prune < self.result_ttl:
+            return
+        self._last_prune = now
+        for name in os.listdir(self.lock_dir):
+            ttl = self.lock_ttl if name.endswith(".lock") else self.result_ttl
+            path = os.path.join(self.lock_dir, name)
+            try:
+                if os.path.getmtime(path) < now - ttl:
+                    os.remove(path)
+            except OSError:
+                pass
+
+    @staticmethod
+    def _read_result(path, not_before):
+        """Read a result written by a leader that finished after not_before"""
+        try:
+            if os.path.getmtime(path) < not_before:
+                return None
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def _write_result(path, value, max_bytes):
+        try:
+            payload = json.dumps({"value": value})
+        except TypeError:
+            return  # not shareable across processes; followers recompute
+        if len(payload) > max_bytes:
+            return  # too big to be worth a synchronous write
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "w") as f:
+            f.write(payload)
+        os.replace(tmp_path, path)
@@ -0,0 +1,119 @@
+"""Checks for admission.AdmissionController"""
+import threading
+import time
+
+import pytest
+
+import admission
+from admission import BULK, INTERACTIVE, AdmissionController, AdmissionRejected, TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(admission.time, 'monotonic', fake)
+    return fake
+
+
+def admit_once(controller, client='a', path='manual', priority=INTERACTIVE):
+    with controller.admit(client, path, priority):
+        pass
+
+
+def test_bucket_refills_over_time(clock):
+    bucket = TokenBucket(rate=0.5, capacity=2)
+    assert bucket.take() == 0
+    assert bucket.take() == 0
+    assert bucket.take() == pytest.approx(2.0)
+
+    clock.now += 2
+    assert bucket.take() == 0
+    assert not bucket.is_full()
+    clock.now += 10
+    assert bucket.is_full()
+
+
+def test_rate_limit_is_per_client(clock):
+    controller = AdmissionController(rate=0.5, burst=2)
+    admit_once(controller, 'a')
+    admit_once(controller, 'a')
+    with pytest.raises(AdmissionRejected) as excinfo:
+        admit_once(controller, 'a')
+    assert excinfo.value.reason == 'rate limited'
+    assert excinfo.value.retry_after == 2
+
+    admit_once(controller, 'b')
+    clock.now += 2
+    admit_once(controller, 'a')
+    assert controller.stats()['rejected_rate_limited'] == 1
+
+
+def test_bulk_gets_a_share_and_is_not_queued():
+    controller = AdmissionController(burst=100, limits={'image': 4, 'manual': 8}, bulk_share=0.5)
+    with controller.admit('a', 'image', BULK), controller.admit('b', 'image', BULK):
+        with pytest.raises(AdmissionRejected) as excinfo:
+            admit_once(controller, 'c', 'image', BULK)
+        assert excinfo.value.reason == 'busy'
+        # Interactive traffic can still use the rest of the limit
+        admit_once(controller, 'd', 'image', INTERACTIVE)
+    assert controller.stats()['rejected_concurrency'] == 1
+
+
+def test_busy_rejection_refunds_the_token():
+    controller = AdmissionController(burst=1, limits={'image': 2, 'manual': 2})
+    with controller.admit('holder', 'image', BULK):
+        for _ in range(3):
+            with pytest.raises(AdmissionRejected) as excinfo:
+                admit_once(controller, 'retrier', 'image', BULK)
+            assert excinfo.value.reason == 'busy'
+    # The retrier's single token was never spent
+    admit_once(controller, 'retrier', 'image', BULK)
+
+
+def test_interactive_queues_until_timeout():
+    controller = AdmissionController(burst=100, limits={'image': 1, 'manual': 1}, queue_timeout=0.1)
+    with controller.admit('a', 'image'):
+        start = time.monotonic()
+        with pytest.raises(AdmissionRejected):
+            admit_once(controller, 'b', 'image')
+        assert time.monotonic() - start >= 0.1
+
+    stats = controller.stats()
+    assert stats['queued'] == 1
+    assert stats['rejected_concurrency'] == 1
+    assert stats['active'] == {'image': 0, 'manual': 0}
+
+
+def test_interactive_queue_is_admitted_when_a_slot_frees():
+    controller = AdmissionController(burst=100, limits={'image': 1, 'manual': 1}, queue_timeout=5)
+    holding = threading.Event()
+    release = threading.Event()
+
+    def hold():
+        with controller.admit('a', 'image'):
+            holding.set()
+            release.wait()
+
+    holder = threading.Thread(target=hold)
+    holder.start()
+    holding.wait()
+    threading.Timer(0.1, release.set).start()
+    admit_once(controller, 'b', 'image')
+    holder.join()
+    assert controller.stats()['admitted']['image'] == 2
+
+
+def test_bucket_table_is_bounded(monkeypatch):
+    monkeypatch.setattr(AdmissionController, 'MAX_BUCKETS', 3)
+    controller = AdmissionController(rate=0.001, burst=5)
+    for client in 'abcdef':
+        admit_once(controller, client)  # every bucket is part-used, so none are full
+    assert controller.stats()['tracked_clients'] <= 3
@@ -0,0 +1,91 @@
+"""Flask test-client checks for main.py (runs in development mode, without the model)"""
+import io
+import json
+import threading
+import time
+
+import numpy as np
+import pytest
+from PIL import Image
+
+for module in ('torch', 'torchvision', 'matplotlib', 'flask', 'openai', 'dotenv'):
+    pytest.importorskip(module)
+
+import model_loader
+
+
+def _no_model():
+    raise FileNotFoundError("model disabled for tests")
+
+
+model_loader.load_model_with_fallback = _no_model
+import main  # noqa: E402
+
+METRICS = {
+    "recommended_panels": 20, "recommended_panels_explanation": "",
+    "total_capacity_kw": 6.0, "total_capacity_kw_explanation": "",
+    "yearly_production_kwh": 8000.0, "yearly_production_explanation": "",
+    "installation_cost_inr": 300000.0, "installation_cost_explanation": "",
+    "yearly_savings_inr": 52000.0, "yearly_savings_explanation": "",
+    "payback_period_years": 5.8, "payback_period_explanation": "",
+}
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setitem(main.app.config, 'UPLOAD_FOLDER', str(tmp_path))
+    monkeypatch.setattr(main, 'admission_control', main.AdmissionController(burst=100))
+
+    model_runs = []
+
+    def slow_model(image):
+        model_runs.append(image.size)
+        time.sleep(0.3)
+        mask = np.zeros((256, 256), dtype=np.int64)
+        mask[20:200, 30:230] = 1
+        return mask, float(np.sum(mask == 1) * 0.01)
+
+    def slow_openrouter(prompt):
+        time.sleep(0.5)
+        return json.dumps(METRICS)
+
+    monkeypatch.setattr(main, 'MODEL_AVAILABLE', True)
+    monkeypatch.setattr(main, 'run_model', slow_model)
+    monkeypatch.setattr(main, 'ask_openrouter', slow_openrouter)
+    client = main.app.test_client()
+    client.model_runs = model_runs
+    return client
+
+
+def roof_png():
+    buffer = io.BytesIO()
+    Image.new('RGB', (64, 64), (200, 90, 60)).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def test_concurrent_identical_uploads_both_get_results(client, tmp_path):
+    before = main.single_flight.stats()['deduplicated_threads']
+    image_bytes = roof_png()
+    statuses = []
+    bodies = []
+
+    def upload():
+        response = client.post('/analyze', data={
+            'method': 'image',
+            'file': (io.BytesIO(image_bytes), 'roof.png'),
+        }, content_type='multipart/form-data')
+        statuses.append(response.status_code)
+        bodies.append(response.data)
+
+    threads = [threading.Thread(target=upload) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert statuses == [200, 200]
+    assert all(b'Analysis Complete' in body for body in bodies)
+    assert len(client.model_runs) == 1
+    assert main.single_flight.stats()['deduplicated_threads'] > before
+    # Each request removed only its own upload
+    assert list(tmp_path.iterdir()) == []
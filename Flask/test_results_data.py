@@ -0,0 +1,74 @@
+"""Checks for results_data: mask RLE, payloads and ResultStore"""
+import json
+import os
+import time
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from results_data import (ResultStore, build_result_payload, decode_mask_rle,
+                          encode_analysis_image, encode_mask_rle)
+
+
+@pytest.mark.parametrize('mask', [
+    np.zeros((4, 5), dtype=np.int64),
+    np.ones((4, 5), dtype=np.int64),
+    np.eye(6, dtype=np.int64),
+    (np.random.default_rng(0).random((64, 48)) > 0.6).astype(np.int64),
+])
+def test_rle_round_trip(mask):
+    rle = encode_mask_rle(mask)
+    assert sum(rle['counts']) == mask.size
+    assert np.array_equal(decode_mask_rle(rle), mask)
+
+
+def test_rle_starts_with_a_background_run():
+    assert encode_mask_rle(np.array([[1, 1, 0]]))['counts'] == [0, 2, 1]
+    assert encode_mask_rle(np.array([[0, 1, 1]]))['counts'] == [1, 2]
+
+
+def test_rle_only_keeps_the_rooftop_class():
+    mask = np.array([[0, 1, 2, 1]])
+    assert np.array_equal(decode_mask_rle(encode_mask_rle(mask)), [[0, 1, 0, 1]])
+
+
+def test_rle_of_empty_mask():
+    rle = encode_mask_rle(np.zeros((0, 3)))
+    assert rle == {'shape': [0, 3], 'counts': []}
+    assert decode_mask_rle(rle).shape == (0, 3)
+
+
+def test_payload_is_compact_json():
+    image = Image.new('RGB', (512, 512), (120, 130, 140))
+    mask = np.zeros((256, 256), dtype=np.int64)
+    mask[50:150, 60:200] = 1
+    analysis = encode_analysis_image(image, mask)
+    assert analysis['image'].startswith('data:image/jpeg;base64,')
+
+    payload = build_result_payload(np.float64(140.0), {'yearly_savings_inr': 1.0}, '{}', 'image', analysis)
+    encoded = json.dumps(payload)
+    assert len(encoded) < 20 * 1024
+    assert json.loads(encoded)['area'] == 140.0
+
+
+def test_store_save_and_exists(tmp_path):
+    store = ResultStore(str(tmp_path / 'results'))
+    result_id = store.save({'area': 1.0})
+    assert store.exists(result_id)
+    with open(tmp_path / 'results' / store.filename(result_id)) as f:
+        assert json.load(f) == {'area': 1.0}
+
+    assert not store.exists('missing-result-id-000')
+    assert not store.exists('../../etc/passwd')
+
+
+def test_store_prunes_expired_results(tmp_path):
+    store = ResultStore(str(tmp_path), ttl_seconds=60)
+    old_id = store.save({})
+    old = time.time() - 120
+    os.utime(tmp_path / store.filename(old_id), (old, old))
+
+    new_id = store.save({})
+    assert not store.exists(old_id)
+    assert store.exists(new_id)
@@ -0,0 +1,192 @@
+"""Checks for shm_transport: slot lifecycle, serve() error paths and InferenceClient"""
+import multiprocessing
+import threading
+import time
+from multiprocessing import Pipe
+
+import numpy as np
+import pytest
+
+from shm_transport import InferenceClient, SlotDescriptor, SlotRing, serve
+
+
+def make_mask(image):
+    return (image[:, :, 0] > 127).astype(np.uint8)
+
+
+def make_masks(images):
+    return [make_mask(image) for image in images]
+
+
+@pytest.fixture
+def rings():
+    inputs = SlotRing(slots=2, slot_bytes=16 * 16 * 3)
+    outputs = SlotRing(slots=2, slot_bytes=16 * 16)
+    yield inputs, outputs
+    for ring in (inputs, outputs):
+        ring.close()
+        ring.unlink()
+
+
+def start_server(inputs, outputs, handler, max_batch=1):
+    """Run serve() on a thread; returns (client, server thread, server conn)"""
+    parent, child = Pipe()
+    server = threading.Thread(target=serve, args=(child, inputs, outputs, handler, max_batch), daemon=True)
+    server.start()
+    return InferenceClient(parent, inputs, outputs), server, child
+
+
+def drain(ring):
+    """Acquire every free slot (proves none leaked) and hand them back"""
+    slots = [ring.acquire(timeout=1) for _ in range(ring.slots)]
+    for slot in slots:
+        ring.release(slot)
+    return sorted(slots)
+
+
+def test_slot_lifecycle(rings):
+    inputs, _ = rings
+    first = inputs.acquire(timeout=1)
+    second = inputs.acquire(timeout=1)
+    with pytest.raises(TimeoutError):
+        inputs.acquire(timeout=0.05)
+
+    image = np.arange(16 * 16 * 3, dtype=np.uint8).reshape(16, 16, 3)
+    desc = inputs.write(first, image)
+    view = inputs.view(desc)
+    assert np.array_equal(view, image)
+    view[0, 0, 0] = 255  # zero-copy: writes land in the slot
+    assert inputs.view(desc)[0, 0, 0] == 255
+    del view
+
+    inputs.release(first)
+    inputs.release(second)
+    assert drain(inputs) == [0, 1]
+
+
+def test_view_rejects_oversized_descriptor(rings):
+    inputs, _ = rings
+    with pytest.raises(ValueError):
+        inputs.view(SlotDescriptor(0, (32, 32, 3), '|u1'))
+
+
+def test_round_trip(rings):
+    inputs, outputs = rings
+    client, server, _ = start_server(inputs, outputs, make_mask)
+    image = np.random.default_rng(0).integers(0, 256, (16, 16, 3), dtype=np.uint8)
+
+    with client.infer(image, timeout=5) as mask:
+        assert np.array_equal(mask, make_mask(image))
+    del mask
+
+    client.close()
+    server.join(timeout=5)
+    assert drain(inputs) == [0, 1]
+    assert drain(outputs) == [0, 1]
+
+
+def test_oversized_result_does_not_leak_slots(rings):
+    inputs, outputs = rings
+    client, server, _ = start_server(inputs, outputs, lambda image: np.zeros((32, 32), np.uint8))
+    image = np.zeros((16, 16, 3), np.uint8)
+
+    for _ in range(outputs.slots + 2):
+        with pytest.raises(ValueError):
+            with client.infer(image, timeout=5):
+                pass
+
+    client.close()
+    server.join(timeout=5)
+    assert drain(inputs) == [0, 1]
+    assert drain(outputs) == [0, 1]
+
+
+def test_concurrent_requests_are_matched_by_id(rings):
+    inputs, outputs = rings
+    client, server, _ = start_server(inputs, outputs, make_masks, max_batch=4)
+    errors = []
+
+    def worker(seed):
+        image = np.random.default_rng(seed).integers(0, 256, (16, 16, 3), dtype=np.uint8)
+        try:
+            for _ in range(10):
+                with client.infer(image, timeout=5) as mask:
+                    assert np.array_equal(mask, make_mask(image))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(seed,)) for seed in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    client.close()
+    server.join(timeout=5)
+
+
+def test_batches_are_handed_to_the_handler_as_lists(rings):
+    inputs, outputs = rings
+    batch_sizes = []
+
+    def batch_handler(images):
+        batch_sizes.append(len(images))
+        return [make_mask(image) for image in images]
+
+    client, server, _ = start_server(inputs, outputs, batch_handler, max_batch=4)
+    with client.infer(np.zeros((16, 16, 3), np.uint8), timeout=5) as mask:
+        assert mask.shape == (16, 16)
+    del mask
+    client.close()
+    server.join(timeout=5)
+    assert batch_sizes == [1]
+
+
+def test_timeout_releases_late_reply(rings):
+    inputs, outputs = rings
+
+    def slow(image):
+        time.sleep(0.3)
+        return make_mask(image)
+
+    client, server, _ = start_server(inputs, outputs, slow)
+    with pytest.raises(TimeoutError):
+        with client.infer(np.zeros((16, 16, 3), np.uint8), timeout=0.05):
+            pass
+
+    time.sleep(0.5)  # late reply arrives and is released by the reader
+    assert drain(inputs) == [0, 1]
+    assert drain(outputs) == [0, 1]
+    client.close()
+    server.join(timeout=5)
+
+
+def test_dead_server_fails_pending_requests(rings):
+    inputs, outputs = rings
+    parent, child = Pipe()
+    client = InferenceClient(parent, inputs, outputs)
+    # Nobody serves; closing the other end looks like the process died
+    threading.Timer(0.1, child.close).start()
+
+    with pytest.raises(ValueError, match="exited"):
+        with client.infer(np.zeros((16, 16, 3), np.uint8), timeout=5):
+            pass
+
+
+def test_serve_in_another_process(rings):
+    inputs, outputs = rings
+    parent, child = Pipe()
+    proc = multiprocessing.Process(target=serve, args=(child, inputs, outputs, make_mask))
+    proc.start()
+    child.close()
+    client = InferenceClient(parent, inputs, outputs)
+    image = np.random.default_rng(1).integers(0, 256, (16, 16, 3), dtype=np.uint8)
+
+    with client.infer(image, timeout=30) as mask:
+        assert np.array_equal(mask, make_mask(image))
+    del mask
+
+    client.close()
+    proc.join(timeout=10)
+    assert proc.exitcode == 0
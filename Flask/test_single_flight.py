@@ -0,0 +1,125 @@
+"""Checks for single_flight.SingleFlight"""
+import multiprocessing
+import os
+import stat
+import threading
+import time
+
+import pytest
+
+from single_flight import SingleFlight
+
+
+def slow_result():
+    time.sleep(0.3)
+    return [1.5, "plot"]
+
+
+def run_in_process(lock_dir, queue):
+    flight = SingleFlight(lock_dir)
+    queue.put((flight.do("key", slow_result), flight.stats()))
+
+
+def run_concurrently(count, target):
+    threads = [threading.Thread(target=target) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def test_threads_share_one_call(tmp_path):
+    flight = SingleFlight(str(tmp_path))
+    results = []
+    run_concurrently(5, lambda: results.append(flight.do("key", slow_result)))
+
+    assert results == [[1.5, "plot"]] * 5
+    stats = flight.stats()
+    assert stats["executed"] == 1
+    assert stats["deduplicated_threads"] == 4
+    assert stats["in_flight"] == 0
+
+
+def test_threads_share_the_error(tmp_path):
+    flight = SingleFlight(str(tmp_path))
+    calls = []
+    errors = []
+
+    def failing():
+        calls.append(1)
+        time.sleep(0.2)
+        raise ValueError("model failed")
+
+    def call():
+        try:
+            flight.do("key", failing)
+        except ValueError as e:
+            errors.append(str(e))
+
+    run_concurrently(3, call)
+    assert len(calls) == 1
+    assert errors == ["model failed"] * 3
+
+
+def test_sequential_calls_are_not_cached(tmp_path):
+    flight = SingleFlight(str(tmp_path))
+    flight.do("key", lambda: 1)
+    assert flight.do("key", lambda: 2) == 2
+    assert flight.stats()["executed"] == 2
+
+
+@pytest.mark.skipif(os.name != "posix", reason="cross-process coalescing needs fcntl")
+def test_processes_share_one_call(tmp_path):
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    procs = [ctx.Process(target=run_in_process, args=(str(tmp_path), queue)) for _ in range(3)]
+    for proc in procs:
+        proc.start()
+    outcomes = [queue.get(timeout=60) for _ in procs]
+    for proc in procs:
+        proc.join()
+
+    # Processes start at different times, so only overlapping ones coalesce
+    assert all(result == [1.5, "plot"] for result, _ in outcomes)
+    executed = sum(stats["executed"] for _, stats in outcomes)
+    shared = sum(stats["deduplicated_processes"] for _, stats in outcomes)
+    assert executed + shared == 3
+    assert executed >= 1
+
+
+def test_lock_dir_is_private(tmp_path):
+    lock_dir = tmp_path / "flight"
+    flight = SingleFlight(str(lock_dir))
+    flight.do("key", lambda: "secret")
+
+    assert stat.S_IMODE(os.stat(lock_dir).st_mode) == 0o700
+    for name in os.listdir(lock_dir):
+        if name.endswith(".json"):
+            assert stat.S_IMODE(os.stat(lock_dir / name).st_mode) == 0o600
+
+
+def test_prune_removes_stale_files(tmp_path):
+    flight = SingleFlight(str(tmp_path), result_ttl=30, lock_ttl=600)
+    flight.do("key", lambda: "value")
+    files = os.listdir(tmp_path)
+    assert files
+
+    old = time.time() - 1000
+    for name in files:
+        os.utime(tmp_path / name, (old, old))
+    flight.prune(force=True)
+    assert os.listdir(tmp_path) == []
+
+
+@pytest.mark.skipif(not hasattr(os, "getuid"), reason="ownership check needs POSIX uids")
+def test_refuses_directory_owned_by_another_user(tmp_path, monkeypatch):
+    monkeypatch.setattr(os, "getuid", lambda: os.stat(tmp_path).st_uid + 1)
+    with pytest.raises(PermissionError):
+        SingleFlight(str(tmp_path))
+
+
+def test_large_results_are_not_written_to_disk(tmp_path):
+    flight = SingleFlight(str(tmp_path), max_shared_bytes=1024)
+    assert flight.do("big", lambda: "x" * 4096) == "x" * 4096
+    flight.do("small", lambda: "x")
+    assert len([name for name in os.listdir(tmp_path) if name.endswith(".json")]) == 1